@@ -3,6 +3,7 @@
 import argparse
 import logging
 import sys
+import time
 import yaml
 
 import requests
@@ -10,12 +11,27 @@ import requests
 from irgateway import events
 from irgateway import lang
 from irgateway import espeak
+from irgateway import scenarios
+from irgateway import trace
 
 
 LOGGER = logging.getLogger(__name__)
 SCRIPT_LOGGER = logging.getLogger('script')
 
 CONFIG = None
+TRACER = trace.Tracer(size=0)
+
+
+def positive_int(value):
+    try:
+        result = int(value)
+    except ValueError:
+        result = 0
+
+    if result < 1:
+        raise argparse.ArgumentTypeError(
+            'must be a positive integer: %s' % value)
+    return result
 
 
 def get_parser():
@@ -40,10 +56,19 @@ def get_parser():
     subparsers.add_parser('run', parents=[cparser],
                           help='run in event loop')
 
+    tparser = subparsers.add_parser('test', parents=[cparser],
+                                    help='run rule test scenarios')
+    tparser.add_argument('--jobs', type=positive_int, default=None,
+                         help='number of worker processes')
+    tparser.add_argument('paths', nargs='*',
+                         help='scenario files or directories')
+
     return aparser
 
 
 def do_run():
+    global TRACER
+
     try:
         if 'device' in CONFIG:
             listener = events.EventListener(
@@ -60,21 +85,34 @@ def do_run():
     # set up the script
     ast = lang.Parser(lang.Tokenizer(CONFIG['rules'])).parse()
 
+    try:
+        TRACER = trace.Tracer.from_config(CONFIG.get('trace'))
+    except ValueError as e:
+        LOGGER.error('Invalid trace config: %s' % e)
+        sys.exit(1)
+
+    if TRACER.enabled:
+        TRACER.install_signal()
+
     env = {'action': 'initialize'}
-    fenv = {'openhab': openhab,
+    fenv = {'openhab': TRACER.wrap('openhab', openhab),
             'printf': printf,
-            'say': say}
+            'say': TRACER.wrap('say', say)}
 
     ast.eval(env, fenv)
 
     while True:
-        for key, state in listener.get_events():
+        for key, state, timestamp in listener.get_events():
+            TRACER.start_trace(timestamp)
             LOGGER.debug('%s: %s' % (key, state))
             env['action'] = 'event'
             env['key'] = key
             env['state'] = state
             LOGGER.debug('Running event')
-            ast.eval(env, fenv)
+            TRACER.record('dispatch', timestamp, time.time())
+            with TRACER.span('rules'):
+                ast.eval(env, fenv)
+            TRACER.end_trace(args={'key': key, 'state': state})
             LOGGER.debug('Event ran')
 
     return 0
@@ -123,6 +161,9 @@ def main():
         events.EventListener.dump_inputs()
         sys.exit(0)
 
+    if args.action == 'test':
+        return scenarios.main(args.paths, processes=args.jobs)
+
     with open(args.config, 'r') as f:
         CONFIG = yaml.load(f)
 
@@ -1,5 +1,7 @@
+import errno
 import logging
 import re
+import select
 
 import evdev
 import evdev.ecodes
@@ -38,7 +40,7 @@ class EventListener(object):
                 'alt': False,
                 'shift': False}
 
-        for event in self.device.read_loop():
+        for event in self._read_loop():
             if event.type == evdev.ecodes.EV_KEY:
                 code = event.code
                 value = event.value
@@ -68,7 +70,20 @@ class EventListener(object):
                     key = '%s-%s' % (mod, key)
 
                 if emit:
-                    yield (key, state)
+                    yield (key, state, event.timestamp())
+
+    def _read_loop(self):
+        # like InputDevice.read_loop, but survives signals (trace dumps)
+        while True:
+            try:
+                select.select([self.device.fd], [], [])
+            except select.error as e:
+                if e.args[0] == errno.EINTR:
+                    continue
+                raise
+
+            for event in self.device.read():
+                yield event
 
     @classmethod
     def dump_inputs(self):
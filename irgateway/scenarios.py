@@ -0,0 +1,240 @@
+import logging
+import multiprocessing
+import os
+import sys
+import traceback
+
+import yaml
+
+from irgateway import lang
+
+LOGGER = logging.getLogger(__name__)
+
+# parsed rules files (or the exception parsing raised), keyed by
+# absolute path.  Populated in the parent before the worker pool forks,
+# so every worker shares the same parse.
+PROGRAMS = {}
+
+SCENARIO_KEYS = {'rules': None,
+                 'setup': ['env', 'fenv'],
+                 'events': None,
+                 'expectations': ['env', 'fenv', 'calls']}
+
+
+class ScenarioFailure(Exception):
+    pass
+
+
+class RecordingFunction(object):
+    """
+    stand-in for an fenv function (openhab, say, etc) that
+    records the arguments of every call
+    """
+    def __init__(self, retval=True):
+        self.retval = retval
+        self.calls = []
+
+    def __call__(self, *args):
+        self.calls.append(list(args))
+        return self.retval
+
+
+def load_program(path):
+    path = os.path.abspath(path)
+
+    if path not in PROGRAMS:
+        LOGGER.debug('Parsing rules: %s' % path)
+        # parse failures are cached too, so a broken rules file is
+        # only parsed once no matter how many scenarios use it
+        try:
+            tokenizer = lang.Tokenizer(path)
+            try:
+                PROGRAMS[path] = lang.Parser(tokenizer).parse()
+            finally:
+                tokenizer.fp.close()
+        except Exception as e:
+            PROGRAMS[path] = e
+
+    if isinstance(PROGRAMS[path], Exception):
+        raise PROGRAMS[path]
+
+    return PROGRAMS[path]
+
+
+def load_scenario(definition):
+    with open(definition, 'r') as f:
+        config = yaml.safe_load(f) or {}
+
+    # scenarios default to the rules file of the same name, but can
+    # point at a shared rules file relative to the scenario
+    if 'rules' in config:
+        rules = os.path.join(os.path.dirname(definition), config['rules'])
+    else:
+        rules = os.path.splitext(definition)[0] + '.rules'
+
+    config['rules'] = os.path.abspath(rules)
+    return config
+
+
+def discover(paths):
+    definitions = []
+
+    for path in paths:
+        if os.path.isdir(path):
+            definitions += sorted(
+                [os.path.join(path, x) for x in os.listdir(path)
+                 if x.endswith('.yml')])
+        else:
+            definitions.append(path)
+
+    return definitions
+
+
+def check_scenario(config):
+    """
+    make sure a scenario actually checks something, so a typo
+    can't turn into a silent pass
+    """
+    for key in config:
+        if key not in SCENARIO_KEYS:
+            raise ScenarioFailure('unknown key: %s' % key)
+
+        allowed = SCENARIO_KEYS[key]
+        if allowed is None:
+            continue
+        if not isinstance(config[key], dict):
+            raise ScenarioFailure('%s: expecting a mapping' % key)
+        for subkey in config[key]:
+            if subkey not in allowed:
+                raise ScenarioFailure('unknown key: %s.%s' % (key, subkey))
+
+    if not any(config.get('expectations', {}).values()):
+        raise ScenarioFailure('no expectations')
+
+
+def run_scenario(definition, config=None):
+    if config is None:
+        config = load_scenario(definition)
+
+    check_scenario(config)
+    ast = load_program(config['rules'])
+
+    # set up prereqs
+    env = {}
+    fenv = {}
+
+    setup = config.get('setup', {})
+    for k, v in setup.get('env', {}).iteritems():
+        env[k] = v
+
+    fenv_setup = setup.get('fenv', [])
+    if isinstance(fenv_setup, basestring):
+        fenv_setup = [fenv_setup]
+    if isinstance(fenv_setup, dict):
+        for k, v in fenv_setup.iteritems():
+            fenv[k] = RecordingFunction(v)
+    else:
+        for k in fenv_setup:
+            fenv[k] = RecordingFunction()
+
+    # run script, once per event.  env carries over between events,
+    # same as the event loop in the daemon
+    for event in config.get('events', [{}]):
+        env.update(event)
+        ast.eval(env, fenv)
+
+    LOGGER.debug('Resulting env: %s' % env)
+
+    # evaluate outcome
+    expect = config.get('expectations', {})
+
+    for k, v in expect.get('env', {}).iteritems():
+        if k not in env:
+            raise ScenarioFailure('env %s: not set (expected %r)' % (k, v))
+        if env[k] != v:
+            raise ScenarioFailure('env %s: expected %r, got %r' % (
+                k, v, env[k]))
+
+    for k, v in expect.get('fenv', {}).iteritems():
+        if k not in fenv or not fenv[k].calls:
+            raise ScenarioFailure('fenv %s: not called (expected %r)' % (
+                k, v))
+        if fenv[k].calls[-1] != v:
+            raise ScenarioFailure('fenv %s: expected %r, got %r' % (
+                k, v, fenv[k].calls[-1]))
+
+    for k, v in expect.get('calls', {}).iteritems():
+        calls = fenv[k].calls if k in fenv else []
+        if calls != v:
+            raise ScenarioFailure('calls %s: expected %r, got %r' % (
+                k, v, calls))
+
+    return env
+
+
+def _run_one(item):
+    definition, config = item
+
+    try:
+        run_scenario(definition, config)
+    except ScenarioFailure as e:
+        return (definition, str(e))
+    except Exception:
+        return (definition, traceback.format_exc())
+
+    return (definition, None)
+
+
+def run_scenarios(definitions, processes=None):
+    """
+    run scenarios across a process pool, returning a list of
+    (definition, error) tuples, where error is None on success
+    """
+    # load every scenario and parse every referenced rules file once,
+    # up front.  Errors are left for the scenario run to report.
+    items = []
+    for definition in definitions:
+        try:
+            config = load_scenario(definition)
+        except Exception:
+            config = None
+        else:
+            try:
+                load_program(config['rules'])
+            except Exception:
+                pass
+
+        items.append((definition, config))
+
+    if (processes is not None and processes < 2) or len(items) < 2:
+        return [_run_one(x) for x in items]
+
+    pool = multiprocessing.Pool(processes)
+    try:
+        return pool.map(_run_one, items)
+    finally:
+        pool.close()
+        pool.join()
+
+
+def main(rawargs, processes=None):
+    definitions = discover(rawargs or ['.'])
+    if not definitions:
+        print 'No scenarios found'
+        return 1
+
+    results = run_scenarios(definitions, processes)
+
+    failed = 0
+    for definition, error in results:
+        if error:
+            failed += 1
+            print 'FAIL %s: %s' % (definition, error)
+        else:
+            LOGGER.debug('PASS %s' % definition)
+
+    print '%d scenarios, %d failed' % (len(results), failed)
+    return 1 if failed else 0
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
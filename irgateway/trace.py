@@ -0,0 +1,150 @@
+import collections
+import contextlib
+import json
+import logging
+import math
+import os
+import signal
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# Span = (name, trace_id, start, end, args), times in seconds since the
+# epoch.  evdev timestamps are wall clock, so we measure with time.time()
+# to keep everything comparable.
+Span = collections.namedtuple('Span', 'name trace_id start end args')
+
+
+class Tracer(object):
+    """
+    per-event latency tracing.
+
+    Each input event starts a trace at its kernel timestamp.  Spans
+    for rule evaluation and any backend calls it makes are tagged with
+    the current trace and kept in a fixed size ring buffer, which can be
+    dumped in chrome trace event format (chrome://tracing, perfetto).
+    A size of 0 disables tracing.
+    """
+    def __init__(self, size=4096, path=None):
+        self.size = size
+        self.path = path
+        self.spans = collections.deque(maxlen=size or 1)
+        self.trace_id = 0
+        self.trace_start = None
+
+    @classmethod
+    def from_config(cls, config):
+        """
+        build a tracer from the 'trace' config item, which can be
+        a bool, a path to dump to, or a dict with size and file
+        """
+        if not config:
+            return cls(size=0)
+        if config is True:
+            return cls()
+        if isinstance(config, basestring):
+            return cls(path=config)
+        if isinstance(config, dict):
+            return cls(size=config.get('size', 4096),
+                       path=config.get('file'))
+
+        raise ValueError('trace must be a bool, path, or dict: %r' % config)
+
+    @property
+    def enabled(self):
+        return self.size > 0
+
+    def record(self, name, start, end, args=None):
+        if self.enabled:
+            self.spans.append(Span(name, self.trace_id, start, end, args))
+
+    def start_trace(self, timestamp=None):
+        self.trace_id += 1
+        self.trace_start = timestamp if timestamp is not None else time.time()
+        return self.trace_id
+
+    def end_trace(self, name='event', args=None):
+        now = time.time()
+        if self.trace_start is not None:
+            self.record(name, self.trace_start, now, args)
+        self.trace_start = None
+        return now
+
+    @contextlib.contextmanager
+    def span(self, name, args=None):
+        if not self.enabled:
+            yield
+            return
+
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.record(name, start, time.time(), args)
+
+    def wrap(self, name, fn):
+        if not self.enabled:
+            return fn
+
+        def traced(*args):
+            with self.span(name, {'args': repr(args)}):
+                return fn(*args)
+        return traced
+
+    def percentiles(self, percents=(50, 90, 99)):
+        durations = {}
+        for span in self.spans:
+            durations.setdefault(span.name, []).append(span.end - span.start)
+
+        result = {}
+        for name, values in durations.iteritems():
+            values.sort()
+            result[name] = {'count': len(values)}
+            for p in percents:
+                # nearest rank
+                idx = max(0, int(math.ceil(len(values) * p / 100.0)) - 1)
+                result[name]['p%s' % p] = values[idx]
+
+        return result
+
+    def log_summary(self):
+        for name, stats in sorted(self.percentiles().iteritems()):
+            LOGGER.info('%-10s n=%-6d p50=%.1fms p90=%.1fms p99=%.1fms' % (
+                name, stats['count'], stats['p50'] * 1000,
+                stats['p90'] * 1000, stats['p99'] * 1000))
+
+    def dump(self, path=None):
+        path = path or self.path
+        pid = os.getpid()
+
+        events = []
+        for span in list(self.spans):
+            args = dict(span.args or {})
+            args['trace_id'] = span.trace_id
+            events.append({'name': span.name,
+                           'ph': 'X',
+                           'pid': pid,
+                           'tid': 0,
+                           'ts': span.start * 1000000,
+                           'dur': (span.end - span.start) * 1000000,
+                           'args': args})
+
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events,
+                       'displayTimeUnit': 'ms'}, f)
+
+        LOGGER.info('Wrote %d spans to %s' % (len(events), path))
+
+    def install_signal(self, signum=signal.SIGUSR1):
+        def handler(signum, frame):
+            self.log_summary()
+            if self.path:
+                try:
+                    self.dump()
+                except IOError as e:
+                    LOGGER.error('Error writing trace: %s' % e)
+
+        signal.signal(signum, handler)
+        # restart interrupted syscalls, so a dump doesn't break an
+        # in-flight openhab request.  select() still gets EINTR.
+        signal.siginterrupt(signum, False)
@@ -0,0 +1,73 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import mock
+
+from irgateway import cli
+from irgateway import trace
+
+
+RULES = '''
+if (action == "event") {
+   openhab(key, state)
+   say(key)
+}
+'''
+
+
+class Done(Exception):
+    pass
+
+
+class StubListener(object):
+    def __init__(self, events):
+        self.events = events
+
+    def get_events(self):
+        for event in self.events:
+            yield event
+        raise Done()
+
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.rules = os.path.join(self.tmpdir, 'test.rules')
+        with open(self.rules, 'w') as f:
+            f.write(RULES)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_do_run_traces(self):
+        listener = StubListener([('up', 'down', 100.0),
+                                 ('down', 'down', 101.0)])
+        config = {'device': '/dev/null',
+                  'rules': self.rules,
+                  'trace': True}
+
+        with mock.patch.object(cli, 'CONFIG', config), \
+                mock.patch.object(cli, 'TRACER', trace.Tracer(size=0)), \
+                mock.patch.object(cli, 'openhab') as openhab, \
+                mock.patch.object(cli, 'say') as say, \
+                mock.patch.object(trace.Tracer, 'install_signal'), \
+                mock.patch('irgateway.events.EventListener',
+                           return_value=listener):
+            self.assertRaises(Done, cli.do_run)
+            tracer = cli.TRACER
+
+        openhab.assert_called_with('down', 'down')
+        say.assert_called_with('down')
+
+        spans = list(tracer.spans)
+        for trace_id, timestamp in [(1, 100.0), (2, 101.0)]:
+            names = [x.name for x in spans if x.trace_id == trace_id]
+            self.assertEqual(
+                ['dispatch', 'openhab', 'say', 'rules', 'event'], names)
+
+            for span in spans:
+                if span.trace_id == trace_id and \
+                        span.name in ['dispatch', 'event']:
+                    self.assertEqual(timestamp, span.start)
@@ -0,0 +1,50 @@
+import errno
+import select
+import unittest
+
+import evdev
+import evdev.ecodes
+import mock
+
+from irgateway import events
+
+
+def key_event(sec, usec, code, value):
+    return evdev.InputEvent(sec, usec, evdev.ecodes.EV_KEY, code, value)
+
+
+class TestEvents(unittest.TestCase):
+    def setUp(self):
+        self.device = mock.MagicMock()
+        self.device.fd = 7
+
+        with mock.patch('evdev.InputDevice', return_value=self.device):
+            self.listener = events.EventListener(device_path='/dev/null')
+
+    def test_timestamp(self):
+        self.device.read.return_value = [
+            key_event(10, 500000, evdev.ecodes.KEY_UP, 1),
+            key_event(11, 250000, evdev.ecodes.KEY_UP, 0)]
+
+        with mock.patch('select.select', return_value=([7], [], [])):
+            gen = self.listener.get_events()
+            self.assertEqual(('up', 'down', 10.5), next(gen))
+            self.assertEqual(('up', 'up', 11.25), next(gen))
+
+    def test_select_eintr(self):
+        self.device.read.return_value = [
+            key_event(10, 500000, evdev.ecodes.KEY_UP, 1)]
+
+        results = [select.error(errno.EINTR, 'Interrupted system call'),
+                   ([7], [], [])]
+        with mock.patch('select.select', side_effect=results) as sel:
+            result = next(self.listener.get_events())
+
+        self.assertEqual(2, sel.call_count)
+        self.assertEqual(('up', 'down', 10.5), result)
+
+    def test_select_error(self):
+        error = select.error(errno.EBADF, 'Bad file descriptor')
+        with mock.patch('select.select', side_effect=error):
+            self.assertRaises(select.error, next,
+                              self.listener.get_events())
@@ -0,0 +1,134 @@
+import json
+import os
+import shutil
+import signal
+import tempfile
+import time
+import unittest
+
+import mock
+
+from irgateway import trace
+
+
+class TestTrace(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test_trace_context(self):
+        tracer = trace.Tracer(size=16)
+        fn = tracer.wrap('openhab', lambda what, state: True)
+
+        tracer.start_trace(time.time() - 0.01)
+        with tracer.span('rules'):
+            self.assertTrue(fn('Light', 'ON'))
+        tracer.end_trace()
+
+        names = [x.name for x in tracer.spans]
+        self.assertEqual(['openhab', 'rules', 'event'], names)
+        self.assertEqual(set([1]), set([x.trace_id for x in tracer.spans]))
+
+        event = tracer.spans[-1]
+        self.assertTrue(event.end - event.start >= 0.01)
+
+    def test_ring_buffer(self):
+        tracer = trace.Tracer(size=4)
+        for x in range(10):
+            tracer.start_trace()
+            tracer.end_trace()
+
+        self.assertEqual(4, len(tracer.spans))
+        self.assertEqual(10, tracer.spans[-1].trace_id)
+
+    def test_disabled(self):
+        tracer = trace.Tracer(size=0)
+        fn = lambda: True
+
+        self.assertIs(fn, tracer.wrap('say', fn))
+        tracer.start_trace()
+        with tracer.span('rules'):
+            pass
+        tracer.end_trace()
+
+        self.assertEqual(0, len(tracer.spans))
+
+    def test_percentiles(self):
+        tracer = trace.Tracer(size=200)
+        for x in range(100):
+            tracer.record('event', 0, x + 1)
+
+        stats = tracer.percentiles()['event']
+        self.assertEqual(100, stats['count'])
+        self.assertEqual(50, stats['p50'])
+        self.assertEqual(90, stats['p90'])
+        self.assertEqual(99, stats['p99'])
+
+    def test_percentiles_small(self):
+        tracer = trace.Tracer(size=16)
+        tracer.record('event', 0, 1)
+        tracer.record('event', 0, 2)
+
+        stats = tracer.percentiles()['event']
+        self.assertEqual(1, stats['p50'])
+        self.assertEqual(2, stats['p90'])
+
+    def test_dump(self):
+        path = os.path.join(self.tmpdir, 'trace.json')
+        tracer = trace.Tracer(size=16, path=path)
+        tracer.start_trace(1.0)
+        tracer.end_trace(args={'key': 'up'})
+        tracer.dump()
+
+        with open(path, 'r') as f:
+            events = json.load(f)['traceEvents']
+
+        self.assertEqual(1, len(events))
+        self.assertEqual('X', events[0]['ph'])
+        self.assertEqual(1000000, events[0]['ts'])
+        self.assertEqual('up', events[0]['args']['key'])
+        self.assertEqual(1, events[0]['args']['trace_id'])
+
+    def test_dump_single_row(self):
+        path = os.path.join(self.tmpdir, 'trace.json')
+        tracer = trace.Tracer(size=16, path=path)
+        for x in range(3):
+            tracer.start_trace()
+            tracer.end_trace()
+        tracer.dump()
+
+        with open(path, 'r') as f:
+            events = json.load(f)['traceEvents']
+
+        self.assertEqual(set([0]), set([x['tid'] for x in events]))
+        self.assertEqual([1, 2, 3], [x['args']['trace_id'] for x in events])
+
+    def test_from_config(self):
+        self.assertFalse(trace.Tracer.from_config(None).enabled)
+        self.assertFalse(trace.Tracer.from_config(False).enabled)
+
+        tracer = trace.Tracer.from_config(True)
+        self.assertTrue(tracer.enabled)
+        self.assertIsNone(tracer.path)
+
+        tracer = trace.Tracer.from_config('/tmp/x.json')
+        self.assertTrue(tracer.enabled)
+        self.assertEqual('/tmp/x.json', tracer.path)
+
+        tracer = trace.Tracer.from_config({'size': 8, 'file': '/tmp/y'})
+        self.assertEqual(8, tracer.size)
+        self.assertEqual('/tmp/y', tracer.path)
+
+        self.assertRaises(ValueError, trace.Tracer.from_config, 5)
+
+    def test_install_signal_restarts_syscalls(self):
+        tracer = trace.Tracer(size=16)
+
+        with mock.patch('signal.signal') as sig:
+            with mock.patch('signal.siginterrupt') as siginterrupt:
+                tracer.install_signal()
+
+        self.assertEqual(signal.SIGUSR1, sig.call_args[0][0])
+        siginterrupt.assert_called_once_with(signal.SIGUSR1, False)